@@ -1,17 +1,31 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter, field_validator, model_validator
 import os
-import requests
+import asyncio
+import logging
+import httpx
+import orjson
+import redis.asyncio as redis
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import re
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import islice
+from operator import attrgetter
+from types import MappingProxyType
+from cachetools import TTLCache
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Ecosystem API")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Ecosystem API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -29,19 +43,165 @@ app.add_middleware(
     max_age=3600  # Cache preflight requests for 1 hour
 )
 
+# Compress larger JSON responses such as the station list
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Get API keys from environment variables
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 NS_API_KEY = os.getenv("NS_API_KEY")
+REDIS_URL = os.getenv("REDIS_URL")
 
 if not GOOGLE_MAPS_API_KEY or not NS_API_KEY:
     raise ValueError("Missing required API keys in environment variables")
 
+# Shared async HTTP clients for the NS and Google Maps APIs, created on startup.
+# Connections are pooled and kept alive across requests to the same host, and
+# HTTP/2 lets concurrent requests share a single connection per host.
+HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+UPSTREAM_ACCEPT_ENCODING = "gzip, br"
+
+ns_client: httpx.AsyncClient = None
+gmaps_client: httpx.AsyncClient = None
+
+# Upstream API endpoints
+NS_STATIONS_URL = "https://gateway.apiportal.ns.nl/reisinformatie-api/api/v2/stations"
+NS_DEPARTURES_URL = "https://gateway.apiportal.ns.nl/reisinformatie-api/api/v2/departures"
+NS_TRIPS_URL = "https://gateway.apiportal.ns.nl/reisinformatie-api/api/v3/trips"
+NS_STATION_DISRUPTIONS_URL = "https://gateway.apiportal.ns.nl/disruptions/v3/station"
+GMAPS_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+GMAPS_DIRECTIONS_URL = "https://maps.googleapis.com/maps/api/directions/json"
+GMAPS_DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+# Query parameters shared by every Google Maps request
+GMAPS_PARAMS = MappingProxyType({"key": GOOGLE_MAPS_API_KEY})
+
+# Optional Redis cache for slow-changing upstream data; disabled without REDIS_URL
+redis_client: Optional[redis.Redis] = None
+
+REDIS_TIMEOUT = 0.5
+
+GEOCODE_CACHE_TTL = 48 * 3600
+STATIONS_CACHE_TTL = 24 * 3600
+STATIONS_CACHE_KEY = "ns:stations:v2"
+# The station list rarely changes, so its ETag/Last-Modified validator and
+# body are kept longer than the body itself for cheap conditional refreshes
+STATIONS_VALIDATOR_TTL = 7 * 24 * 3600
+STATIONS_VALIDATOR_KEY = "ns:stations:v2:validator"
+
+# Google's per-request limit on Distance Matrix destinations
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+
+# Road numbers such as A2 or N201 in direction step instructions
+ROAD_NAME_RE = re.compile(r"\b[A-Z]\d+\b")
+NON_NUMERIC_RE = re.compile(r"[^\d.]")
+
+# Traffic level by ratio of duration in traffic to normal duration:
+# above 1.2 is Moderate, above 1.4 is Heavy
+TRAFFIC_RATIO_THRESHOLDS = (1.2, 1.4)
+TRAFFIC_LEVELS = ("Light", "Moderate", "Heavy")
+
+# Upper bound on legs transformed per trip, for trips with many transfers
+MAX_LEGS_PER_TRIP = 8
+
+# Per-process cache of active disruptions per station; NS updates these within minutes
+DISRUPTIONS_CACHE_TTL = 60
+_disruptions_cache: TTLCache = TTLCache(maxsize=500, ttl=DISRUPTIONS_CACHE_TTL)
+# In-flight fetches per station, shared by concurrent misses and removed on completion
+_disruptions_fetches: Dict[str, "asyncio.Task[Optional[List[Disruption]]]"] = {}
+
+@app.on_event("startup")
+async def startup():
+    global ns_client, gmaps_client, redis_client
+    ns_client = httpx.AsyncClient(
+        headers={
+            "Ocp-Apim-Subscription-Key": NS_API_KEY,
+            "Accept": "application/json",
+            "Accept-Encoding": UPSTREAM_ACCEPT_ENCODING
+        },
+        http2=True,
+        limits=HTTP_LIMITS,
+        timeout=10.0
+    )
+    gmaps_client = httpx.AsyncClient(
+        headers={"Accept-Encoding": UPSTREAM_ACCEPT_ENCODING},
+        http2=True,
+        limits=HTTP_LIMITS,
+        timeout=10.0
+    )
+    if REDIS_URL:
+        # Short timeouts so an unreachable Redis degrades to direct API calls
+        redis_client = redis.Redis.from_url(
+            REDIS_URL,
+            socket_connect_timeout=REDIS_TIMEOUT,
+            socket_timeout=REDIS_TIMEOUT
+        )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await ns_client.aclose()
+    await gmaps_client.aclose()
+    if redis_client:
+        await redis_client.aclose()
+
+async def cache_get_raw(key: str) -> Optional[bytes]:
+    """Read raw bytes from Redis, treating any Redis failure as a miss"""
+    if not redis_client:
+        return None
+    try:
+        return await redis_client.get(key)
+    except redis.RedisError as e:
+        logger.warning("Redis get failed for %s: %s", key, e)
+        return None
+
+async def cache_get(key: str) -> Optional[Any]:
+    """Read a JSON value from Redis, treating any Redis failure as a miss"""
+    cached = await cache_get_raw(key)
+    return orjson.loads(cached) if cached is not None else None
+
+async def cache_set_raw(key: str, ttl: int, value: bytes) -> None:
+    """Store raw bytes in Redis, ignoring any Redis failure"""
+    if not redis_client:
+        return
+    try:
+        await redis_client.setex(key, ttl, value)
+    except redis.RedisError as e:
+        logger.warning("Redis set failed for %s: %s", key, e)
+
+async def cache_set(key: str, ttl: int, value: Any) -> None:
+    """Store a JSON value in Redis, ignoring any Redis failure"""
+    await cache_set_raw(key, ttl, orjson.dumps(value))
+
+async def cache_get_hash(key: str) -> Dict[str, bytes]:
+    """Read a hash from Redis, treating any Redis failure as a miss"""
+    if not redis_client:
+        return {}
+    try:
+        cached = await redis_client.hgetall(key)
+    except redis.RedisError as e:
+        logger.warning("Redis hgetall failed for %s: %s", key, e)
+        return {}
+    return {field.decode(): value for field, value in cached.items()}
+
+async def cache_set_hash(key: str, ttl: int, mapping: Dict[str, Any]) -> None:
+    """Store a hash in Redis with a TTL, ignoring any Redis failure"""
+    if not redis_client:
+        return
+    try:
+        async with redis_client.pipeline() as pipe:
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Redis hset failed for %s: %s", key, e)
+
 class TrainStation(BaseModel):
     code: str
     name: str
     lat: float
     lng: float
 
+train_stations_adapter = TypeAdapter(List[TrainStation])
+
 class Route(BaseModel):
     fromStation: str
     toStation: str
@@ -69,6 +229,34 @@ class Trip(BaseModel):
     crowdForecast: Optional[str] = None
     punctuality: Optional[float] = None
 
+class NSLeg(Leg):
+    """Leg validated directly from an NS trips API leg"""
+    
+    @model_validator(mode="before")
+    @classmethod
+    def from_ns_leg(cls, leg: Dict[str, Any]) -> Dict[str, Any]:
+        product = leg.get("product") or {}
+        origin = leg.get("origin") or {}
+        return {
+            "name": product.get("displayName") or product.get("longCategoryName") or "Train",
+            "direction": leg.get("direction", ""),
+            "plannedDepartureTime": origin.get("plannedDateTime") or origin.get("actualDateTime") or "",
+            "plannedDepartureTrack": origin.get("plannedTrack"),
+            "product": {
+                "longCategoryName": product.get("longCategoryName") or "Train",
+                "number": product.get("number") or ""
+            } if product else None
+        }
+
+class NSTrip(Trip):
+    """Trip validated directly from an NS trips API trip"""
+    plannedDurationInMinutes: int = 0
+    transfers: int = 0
+    status: str = "NORMAL"
+    legs: List[NSLeg]
+
+ns_trips_adapter = TypeAdapter(List[NSTrip])
+
 class Disruption(BaseModel):
     id: str
     title: str
@@ -92,6 +280,14 @@ class CarRoute(BaseModel):
     originName: str
     destinationName: str
     name: str
+    
+    @field_validator("origin", "destination")
+    @classmethod
+    def no_pipe(cls, location: str) -> str:
+        # Google Maps uses "|" to separate locations and has no way to escape it
+        if "|" in location:
+            raise ValueError("must not contain '|'")
+        return location
 
 class CarRouteRequest(BaseModel):
     routes: List[CarRoute]
@@ -112,43 +308,81 @@ class CarTripResponse(BaseModel):
 @app.get("/api/train/stations")
 async def get_train_stations() -> List[TrainStation]:
     """Get all train stations from NS API"""
+    # Cached stations are already validated and serialized, so pass them through untouched
+    cached = await cache_get_raw(STATIONS_CACHE_KEY)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    # Revalidate a previously fetched list instead of downloading it again
+    validator = await cache_get_hash(STATIONS_VALIDATOR_KEY)
+    conditional_headers = {}
+    if validator.get("etag"):
+        conditional_headers["If-None-Match"] = validator["etag"].decode()
+    if validator.get("last_modified"):
+        conditional_headers["If-Modified-Since"] = validator["last_modified"].decode()
+    
     try:
-        headers = {"Ocp-Apim-Subscription-Key": NS_API_KEY}
-        response = requests.get(
-            "https://gateway.apiportal.ns.nl/reisinformatie-api/api/v2/stations",
-            headers=headers
-        )
+        response = await ns_client.get(NS_STATIONS_URL, headers=conditional_headers)
+        
+        if response.status_code == 304 and "body" in validator:
+            body = validator["body"]
+            await cache_set_raw(STATIONS_CACHE_KEY, STATIONS_CACHE_TTL, body)
+            await cache_set_hash(STATIONS_VALIDATOR_KEY, STATIONS_VALIDATOR_TTL, validator)
+            return Response(content=body, media_type="application/json")
+        
         response.raise_for_status()
         
-        stations_data = response.json()
-        stations = []
+        stations_data = orjson.loads(response.content)
+        stations = train_stations_adapter.validate_python([
+            {
+                "code": station.get("code"),
+                "name": (station.get("namen") or {}).get("lang"),
+                "lat": station.get("lat"),
+                "lng": station.get("lng")
+            }
+            for station in stations_data.get("payload", [])
+        ])
         
-        for station in stations_data.get("payload", []):
-            stations.append(TrainStation(
-                code=station.get("code"),
-                name=station.get("namen", {}).get("lang"),
-                lat=station.get("lat"),
-                lng=station.get("lng")
-            ))
+        # Cache exactly the validated JSON so hits and misses return the same bytes
+        body = train_stations_adapter.dump_json(stations)
+        await cache_set_raw(STATIONS_CACHE_KEY, STATIONS_CACHE_TTL, body)
         
-        return stations
-    except requests.RequestException as e:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            await cache_set_hash(STATIONS_VALIDATOR_KEY, STATIONS_VALIDATOR_TTL, {
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+                "body": body
+            })
+        
+        return Response(content=body, media_type="application/json")
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(status_code=500, detail=f"Error fetching train stations: {str(e)}")
 
 @app.get("/api/maps/geocode")
 async def geocode_address(address: str) -> Dict[str, Any]:
     """Geocode an address using Google Maps API"""
+    cache_key = f"geo:{address.strip().lower()}"
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        response = requests.get(
-            "https://maps.googleapis.com/maps/api/geocode/json",
+        response = await gmaps_client.get(
+            GMAPS_GEOCODE_URL,
             params={
-                "address": address,
-                "key": GOOGLE_MAPS_API_KEY
+                **GMAPS_PARAMS,
+                "address": address
             }
         )
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        geocode_data = orjson.loads(response.content)
+        # Only cache definitive answers, not quota or auth errors
+        if geocode_data.get("status") in ("OK", "ZERO_RESULTS"):
+            await cache_set(cache_key, GEOCODE_CACHE_TTL, geocode_data)
+        return geocode_data
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(status_code=500, detail=f"Error geocoding address: {str(e)}")
 
 @app.get("/api/maps/directions")
@@ -159,123 +393,150 @@ async def get_directions(
 ) -> Dict[str, Any]:
     """Get directions using Google Maps API"""
     try:
-        response = requests.get(
-            "https://maps.googleapis.com/maps/api/directions/json",
+        response = await gmaps_client.get(
+            GMAPS_DIRECTIONS_URL,
             params={
+                **GMAPS_PARAMS,
                 "origin": origin,
                 "destination": destination,
-                "mode": mode,
-                "key": GOOGLE_MAPS_API_KEY
+                "mode": mode
             }
         )
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        return orjson.loads(response.content)
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(status_code=500, detail=f"Error getting directions: {str(e)}")
 
 @app.get("/api/train/departures/{station_code}")
 async def get_train_departures(station_code: str) -> Dict[str, Any]:
     """Get train departures for a specific station"""
     try:
-        headers = {"Ocp-Apim-Subscription-Key": NS_API_KEY}
-        response = requests.get(
-            f"https://gateway.apiportal.ns.nl/reisinformatie-api/api/v2/departures?station={station_code}",
-            headers=headers
-        )
+        response = await ns_client.get(NS_DEPARTURES_URL, params={"station": station_code})
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        return orjson.loads(response.content)
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(status_code=500, detail=f"Error fetching departures: {str(e)}")
 
+async def fetch_station_disruptions(station_code: str) -> Optional[List[Disruption]]:
+    """Fetch active disruptions for a station, or None if the fetch failed"""
+    try:
+        disruption_response = await ns_client.get(f"{NS_STATION_DISRUPTIONS_URL}/{station_code}")
+    except httpx.HTTPError:
+        return None
+    if not disruption_response.is_success:
+        return None
+    
+    # Disruptions are best-effort: an unparseable body counts as a failed fetch
+    try:
+        disruption_data = orjson.loads(disruption_response.content)
+    except ValueError:
+        return None
+    
+    disruptions = []
+    if disruption_data.get("payload", {}).get("disruptions"):
+        for disruption in disruption_data["payload"]["disruptions"]:
+            if disruption.get("isActive"):
+                disruptions.append(Disruption.model_construct(
+                    id=disruption.get("id", ""),
+                    title=disruption.get("title", "Unknown disruption"),
+                    isActive=True,
+                    impact={"value": disruption.get("impact", {}).get("value", 1)}
+                ))
+    return disruptions
+
+async def get_station_disruptions(station_code: str) -> List[Disruption]:
+    """Get active disruptions for a station, cached briefly per station"""
+    cached = _disruptions_cache.get(station_code)
+    if cached is not None:
+        return cached
+    
+    # Concurrent misses for the same station share one upstream fetch and its
+    # result, so a failing upstream costs one timeout rather than one per caller
+    fetch = _disruptions_fetches.get(station_code)
+    if fetch is None:
+        fetch = asyncio.ensure_future(fetch_station_disruptions(station_code))
+        _disruptions_fetches[station_code] = fetch
+        
+        def on_fetch_done(done: asyncio.Task) -> None:
+            if _disruptions_fetches.get(station_code) is done:
+                del _disruptions_fetches[station_code]
+            # Failed fetches are not cached so the next request retries
+            if not done.cancelled() and done.exception() is None and done.result() is not None:
+                _disruptions_cache[station_code] = done.result()
+        
+        fetch.add_done_callback(on_fetch_done)
+    
+    # Shielded so one cancelled caller does not cancel the fetch for the others
+    disruptions = await asyncio.shield(fetch)
+    return disruptions if disruptions is not None else []
+
 @app.post("/api/trains/rail_routes")
 async def get_train_routes(request: RouteRequest) -> List[RouteResponse]:
     """Get train routes and disruptions for multiple routes"""
     try:
-        headers = {
-            "Ocp-Apim-Subscription-Key": NS_API_KEY,
-            "Accept": "application/json"
-        }
-        
         now = datetime.utcnow().isoformat()
-        route_responses = []
+        
+        route_keys = []
+        trip_requests = []
+        route_station_codes = []
+        
+        # Pick the (from, to, from code, to code) order once for all routes
+        if request.is_reversed:
+            route_endpoints = attrgetter("toStation", "fromStation", "toStationCode", "fromStationCode")
+        else:
+            route_endpoints = attrgetter("fromStation", "toStation", "fromStationCode", "toStationCode")
         
         for route in request.routes:
-            actual_from_station = route.toStation if request.is_reversed else route.fromStation
-            actual_to_station = route.fromStation if request.is_reversed else route.toStation
-            actual_from_station_code = route.toStationCode if request.is_reversed else route.fromStationCode
-            actual_to_station_code = route.fromStationCode if request.is_reversed else route.toStationCode
+            actual_from_station, actual_to_station, actual_from_station_code, actual_to_station_code = route_endpoints(route)
             
-            route_key = f"{actual_from_station}-{actual_to_station}"
+            route_keys.append(f"{actual_from_station}-{actual_to_station}")
             
-            # Fetch trips
-            trips_url = (
-                f"https://gateway.apiportal.ns.nl/reisinformatie-api/api/v3/trips"
-                f"?fromStation={actual_from_station}"
-                f"&toStation={actual_to_station}"
-                f"&dateTime={now}"
-                f"&searchForArrival=false"
+            trip_requests.append(ns_client.get(
+                NS_TRIPS_URL,
+                params={
+                    "fromStation": actual_from_station,
+                    "toStation": actual_to_station,
+                    "dateTime": now,
+                    "searchForArrival": "false"
+                }
+            ))
+            route_station_codes.append(
+                [code for code in [actual_from_station_code, actual_to_station_code] if code]
             )
-            
-            trips_response = requests.get(trips_url, headers=headers)
+        
+        # Routes often share stations, so fetch disruptions once per unique station
+        unique_station_codes = list(dict.fromkeys(
+            station_code
+            for station_codes in route_station_codes
+            for station_code in station_codes
+        ))
+        
+        # Fetch all trips and disruptions concurrently
+        trip_responses, disruption_lists = await asyncio.gather(
+            asyncio.gather(*trip_requests),
+            asyncio.gather(*[get_station_disruptions(code) for code in unique_station_codes])
+        )
+        station_disruptions = dict(zip(unique_station_codes, disruption_lists))
+        
+        route_responses = []
+        
+        for route_key, trips_response, station_codes in zip(route_keys, trip_responses, route_station_codes):
             trips_response.raise_for_status()
-            trips_data = trips_response.json()
-            
-            # Transform trips
-            transformed_trips = []
-            if trips_data.get("trips"):
-                for idx, trip in enumerate(trips_data["trips"][:request.max_journeys]):
-                    legs = []
-                    if trip.get("legs"):
-                        for leg in trip["legs"]:
-                            legs.append(Leg(
-                                name=leg.get("product", {}).get("displayName") or 
-                                     leg.get("product", {}).get("longCategoryName") or 
-                                     "Train",
-                                direction=leg.get("direction", ""),
-                                plannedDepartureTime=leg.get("origin", {}).get("plannedDateTime") or 
-                                                   leg.get("origin", {}).get("actualDateTime") or 
-                                                   "",
-                                plannedDepartureTrack=leg.get("origin", {}).get("plannedTrack"),
-                                product=Product(
-                                    longCategoryName=leg.get("product", {}).get("longCategoryName") or "Train",
-                                    number=leg.get("product", {}).get("number") or ""
-                                ) if leg.get("product") else None
-                            ))
-                    
-                    transformed_trips.append(Trip(
-                        idx=idx,
-                        plannedDurationInMinutes=trip.get("plannedDurationInMinutes", 0),
-                        actualDurationInMinutes=trip.get("actualDurationInMinutes"),
-                        transfers=trip.get("transfers", 0),
-                        status=trip.get("status", "NORMAL"),
-                        legs=legs,
-                        crowdForecast=trip.get("crowdForecast"),
-                        punctuality=trip.get("punctuality")
-                    ))
+            trips_data = orjson.loads(trips_response.content)
             
-            # Fetch disruptions
-            disruptions = []
-            station_codes = [code for code in [actual_from_station_code, actual_to_station_code] if code]
+            # Validate and transform the requested trips in a single pydantic-core pass
+            transformed_trips = ns_trips_adapter.validate_python([
+                {**trip, "idx": idx, "legs": (trip.get("legs") or [])[:MAX_LEGS_PER_TRIP]}
+                for idx, trip in enumerate((trips_data.get("trips") or [])[:request.max_journeys])
+            ])
             
-            for station_code in station_codes:
-                try:
-                    disruption_url = f"https://gateway.apiportal.ns.nl/disruptions/v3/station/{station_code}"
-                    disruption_response = requests.get(disruption_url, headers=headers)
-                    if disruption_response.ok:
-                        disruption_data = disruption_response.json()
-                        if disruption_data.get("payload", {}).get("disruptions"):
-                            for disruption in disruption_data["payload"]["disruptions"]:
-                                if disruption.get("isActive"):
-                                    disruptions.append(Disruption(
-                                        id=disruption.get("id", ""),
-                                        title=disruption.get("title", "Unknown disruption"),
-                                        isActive=True,
-                                        impact={"value": disruption.get("impact", {}).get("value", 1)}
-                                    ))
-                except requests.RequestException:
-                    continue
+            disruptions = [
+                disruption
+                for station_code in station_codes
+                for disruption in station_disruptions[station_code]
+            ]
             
-            route_responses.append(RouteResponse(
+            route_responses.append(RouteResponse.model_construct(
                 routeKey=route_key,
                 trips=transformed_trips,
                 disruptions=disruptions
@@ -283,7 +544,7 @@ async def get_train_routes(request: RouteRequest) -> List[RouteResponse]:
         
         return route_responses
     
-    except requests.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching train routes: {str(e)}"
@@ -293,34 +554,67 @@ async def get_train_routes(request: RouteRequest) -> List[RouteResponse]:
 async def get_car_routes(request: CarRouteRequest) -> List[CarTripResponse]:
     """Get car routes with traffic information"""
     try:
-        current_routes = [
-            {
-                **route.dict(),
-                "origin": route.destination if request.is_reversed else route.origin,
-                "destination": route.origin if request.is_reversed else route.destination,
-                "originName": route.destinationName if request.is_reversed else route.originName,
-                "destinationName": route.originName if request.is_reversed else route.destinationName,
-            }
-            for route in request.routes
-        ]
+        if request.is_reversed:
+            current_routes = [
+                {
+                    **route.model_dump(),
+                    "origin": route.destination,
+                    "destination": route.origin,
+                    "originName": route.destinationName,
+                    "destinationName": route.originName,
+                }
+                for route in request.routes
+            ]
+        else:
+            current_routes = [route.model_dump() for route in request.routes]
 
-        trip_responses = []
-        
-        for route in current_routes:
-            # Get distance matrix data
-            distance_matrix_url = (
-                "https://maps.googleapis.com/maps/api/distancematrix/json"
-                f"?origins={route['origin']}"
-                f"&destinations={route['destination']}"
-                f"&mode=driving"
-                f"&departure_time=now"
-                f"&traffic_model=best_guess"
-                f"&key={GOOGLE_MAPS_API_KEY}"
+        # Google bills every origin x destination element, so only routes that
+        # share an origin are batched into one 1xM request
+        origin_groups: Dict[str, List[int]] = defaultdict(list)
+        for index, route in enumerate(current_routes):
+            origin_groups[route["origin"]].append(index)
+        batches = [
+            (origin, indices[i:i + DISTANCE_MATRIX_MAX_DESTINATIONS])
+            for origin, indices in origin_groups.items()
+            for i in range(0, len(indices), DISTANCE_MATRIX_MAX_DESTINATIONS)
+        ]
+        distance_matrix_requests = [
+            gmaps_client.get(
+                GMAPS_DISTANCE_MATRIX_URL,
+                params={
+                    **GMAPS_PARAMS,
+                    "origins": origin,
+                    "destinations": "|".join(current_routes[index]["destination"] for index in indices),
+                    "mode": "driving",
+                    "departure_time": "now",
+                    "traffic_model": "best_guess"
+                }
             )
-            
-            distance_matrix_response = requests.get(distance_matrix_url)
+            for origin, indices in batches
+        ]
+        directions_requests = [
+            gmaps_client.get(
+                GMAPS_DIRECTIONS_URL,
+                params={
+                    **GMAPS_PARAMS,
+                    "origin": route["origin"],
+                    "destination": route["destination"],
+                    "mode": "driving"
+                }
+            )
+            for route in current_routes
+        ]
+        
+        # Fetch distance matrices and directions for all routes concurrently
+        distance_matrix_responses, directions_responses = await asyncio.gather(
+            asyncio.gather(*distance_matrix_requests),
+            asyncio.gather(*directions_requests)
+        )
+        
+        elements = [None] * len(current_routes)
+        for (origin, indices), distance_matrix_response in zip(batches, distance_matrix_responses):
             distance_matrix_response.raise_for_status()
-            distance_matrix_data = distance_matrix_response.json()
+            distance_matrix_data = orjson.loads(distance_matrix_response.content)
             
             if distance_matrix_data["status"] != "OK":
                 raise HTTPException(
@@ -328,23 +622,18 @@ async def get_car_routes(request: CarRouteRequest) -> List[CarTripResponse]:
                     detail=f"Distance Matrix API error: {distance_matrix_data['status']}"
                 )
             
-            element = distance_matrix_data["rows"][0]["elements"][0]
+            for index, element in zip(indices, distance_matrix_data["rows"][0]["elements"]):
+                elements[index] = element
+        
+        trip_responses = []
+        
+        for route, element, directions_response in zip(current_routes, elements, directions_responses):
             distance = element["distance"]["text"]
             duration = element["duration"]["text"]
             duration_in_traffic = element.get("duration_in_traffic", {}).get("text", duration)
             
-            # Get route details
-            directions_url = (
-                "https://maps.googleapis.com/maps/api/directions/json"
-                f"?origin={route['origin']}"
-                f"&destination={route['destination']}"
-                f"&mode=driving"
-                f"&key={GOOGLE_MAPS_API_KEY}"
-            )
-            
-            directions_response = requests.get(directions_url)
             directions_response.raise_for_status()
-            directions_data = directions_response.json()
+            directions_data = orjson.loads(directions_response.content)
             
             if directions_data["status"] != "OK":
                 raise HTTPException(
@@ -354,32 +643,19 @@ async def get_car_routes(request: CarRouteRequest) -> List[CarTripResponse]:
             
             # Extract main roads from the route
             steps = directions_data["routes"][0]["legs"][0]["steps"]
-            road_names = []
-            
-            for step in steps:
-                instructions = step["html_instructions"]
-                match = re.search(r"\b[A-Z]\d+\b", instructions)
-                if match:
-                    road_names.append(match.group(0))
-                    if len(road_names) >= 3:
-                        break
+            matches = (ROAD_NAME_RE.search(step["html_instructions"]) for step in steps)
+            road_names = [match.group(0) for match in islice(filter(None, matches), 3)]
             
             route_description = " → ".join(road_names) if road_names else "Local roads"
             
             # Calculate traffic level
             duration_value = element["duration"]["value"]
             duration_in_traffic_value = element.get("duration_in_traffic", {}).get("value", duration_value)
-            ratio = duration_in_traffic_value / duration_value
-            
-            if ratio > 1.4:
-                traffic = "Heavy"
-            elif ratio > 1.2:
-                traffic = "Moderate"
-            else:
-                traffic = "Light"
+            ratio = duration_in_traffic_value / duration_value if duration_value else 1.0
+            traffic = TRAFFIC_LEVELS[bisect_left(TRAFFIC_RATIO_THRESHOLDS, ratio)]
             
             # Calculate fuel cost
-            distance_value = float(re.sub(r'[^\d.]', '', distance))
+            distance_value = float(NON_NUMERIC_RE.sub('', distance))
             fuel_price_per_100km = 12  # Estimate €12 per 100km
             fuel_cost = f"€{((distance_value / 100) * fuel_price_per_100km):.2f}"
             
@@ -397,7 +673,7 @@ async def get_car_routes(request: CarRouteRequest) -> List[CarTripResponse]:
         
         return trip_responses
     
-    except requests.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching car routes: {str(e)}"
@@ -405,4 +681,9 @@ async def get_car_routes(request: CarRouteRequest) -> List[CarTripResponse]:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "4"))
+    ) 
\ No newline at end of file